@@ -7,19 +7,21 @@ primarily with communication to/from the API's users."""
 
 import logging
 import endpoints
-import random
 from protorpc import remote, messages
 from google.appengine.api import memcache
 from google.appengine.api import taskqueue
+from google.appengine.ext import ndb
 
-from tictac import TicTacToe
-from tictac import computer_move
+import board_codec
+import solver
 
-from models import User, Score, TicTac
+from models import User, Score, TicTac, GameArchive
 from models import StringMessage, ScoreForms, NewTicTacForm, TicTacForm
 from models import MakeTicTacMoveForm, GamesForm
 from models import RankForm, RankForms
 from models import History, HistoryForm, HistoryForms
+from models import MoveAnalysisForm, MoveAnalysisForms
+from stats import MEMCACHE_MOVES_REMAINING
 from utils import get_by_urlsafe
 
 
@@ -32,25 +34,28 @@ GET_TICTAC_REQUEST = endpoints.ResourceContainer(
 MAKE_TICTAC_MOVE_REQUEST = endpoints.ResourceContainer(
     MakeTicTacMoveForm,
     urlsafe_game_key=messages.StringField(1),)
+GET_MOVE_ANALYSIS_REQUEST = endpoints.ResourceContainer(
+        urlsafe_game_key=messages.StringField(1),
+        steps=messages.IntegerField(2),)
 NUMBER_OF_RESULTS = endpoints.ResourceContainer(
     number_of_results=messages.IntegerField(1),)
 
-MEMCACHE_MOVES_REMAINING = 'MOVES_REMAINING'
-
 @endpoints.api(name='tic_tac_toe', version='v1')
 class TicTacToeApi(remote.Service):
     """Tic Tac Toe API"""
 
 
-    def legal_moves_str(self, board):
+    def legal_moves_str(self, board_code):
         """ Get the empty spaces """
-        return ' '.join(str(index) for index,
-                square in enumerate(list(board)) if square == ' ')
+        return board_codec.legal_moves_str(board_code)
 
-    def is_legal_moves(self, board, move):
+    def is_legal_moves(self, board_code, move):
         """ Is the move is legal? """
-        return move in [index for index,
-                square in enumerate(list(board)) if square == ' ']
+        return board_codec.is_legal_move(board_code, move)
+
+    def get_archive(self, urlsafe_game_key):
+        """ Get the archive of a game no longer in play """
+        return GameArchive.get_by_id(ndb.Key(urlsafe=urlsafe_game_key).id())
 
 
     @endpoints.method(request_message=USER_REQUEST,
@@ -90,7 +95,7 @@ class TicTacToeApi(remote.Service):
         # This operation is not needed to complete the creation of a new game
         # so it is performed out of sequence.
         taskqueue.add(url='/tasks/cache_average_steps')
-        msg = 'Choose your next move: %s' % self.legal_moves_str(game.board)
+        msg = 'Choose your next move: %s' % self.legal_moves_str(game.board_code)
         return game.to_form(msg)
 
 
@@ -128,6 +133,9 @@ class TicTacToeApi(remote.Service):
                 game.put()
                 msg = 'The game is canelled!'
             return game.to_form(msg)
+        archive = self.get_archive(request.urlsafe_game_key)
+        if archive:
+            return archive.to_form('This game is archived!')
         else:
             raise endpoints.NotFoundException('Game not found!')
 
@@ -141,8 +149,11 @@ class TicTacToeApi(remote.Service):
         """Return the current game state."""
         game = get_by_urlsafe(request.urlsafe_game_key, TicTac)
         if game:
-            msg = 'Choose your next move: %s' % self.legal_moves_str(game.board)
+            msg = 'Choose your next move: %s' % self.legal_moves_str(game.board_code)
             return game.to_form(msg)
+        archive = self.get_archive(request.urlsafe_game_key)
+        if archive:
+            return archive.to_form('This game is archived!')
         else:
             raise endpoints.NotFoundException('Game not found!')
 
@@ -156,6 +167,9 @@ class TicTacToeApi(remote.Service):
         """Makes a move. Returns a game state with message"""
         game = get_by_urlsafe(request.urlsafe_game_key, TicTac)
         if not game:
+            archive = self.get_archive(request.urlsafe_game_key)
+            if archive:
+                return archive.to_form('Game is already over!')
             raise endpoints.NotFoundException('Game not found!')
 
         return game.make_a_move(request.position)
@@ -226,6 +240,40 @@ class TicTacToeApi(remote.Service):
             raise endpoints.NotFoundException('Game not found!')
 
 
+    @endpoints.method(request_message=GET_MOVE_ANALYSIS_REQUEST,
+                      response_message=MoveAnalysisForms,
+                      path='game/analysis/{urlsafe_game_key}',
+                      name='get_move_analysis',
+                      http_method='GET')
+    def get_move_analysis(self, request):
+        """Return the value of every legal move of a game's position. Without
+        steps the current position is analysed, otherwise the position after
+        the history step."""
+        game = get_by_urlsafe(request.urlsafe_game_key, TicTac)
+        if not game:
+            raise endpoints.NotFoundException('Game not found!')
+
+        if request.steps is None:
+            code = game.board_code
+            player = 'X'
+        else:
+            history = History.query(History.game == game.key,
+                                    History.steps == request.steps).get()
+            if not history:
+                raise endpoints.NotFoundException('History step not found!')
+            code = history.board_code
+            player = 'O' if history.is_human else 'X'
+
+        moves = solver.analyse(code, player)
+        return MoveAnalysisForms(
+                board=board_codec.display(code),
+                player=player,
+                recommended_move=solver.best_move(moves),
+                items=[MoveAnalysisForm(position=position, value=value,
+                                        distance=distance)
+                       for position, value, distance in moves])
+
+
     @endpoints.method(response_message=StringMessage,
                       path='games/average_steps',
                       name='get_average_steps',
@@ -234,18 +282,5 @@ class TicTacToeApi(remote.Service):
         """Get the cached average moves remaining"""
         return StringMessage(message=memcache.get(MEMCACHE_MOVES_REMAINING) or '')
 
-    @staticmethod
-    def _cache_average_steps():
-        """Populates memcache with the average moves of Games"""
-        games = TicTac.query(TicTac.game_over == False,
-                             TicTac.cancelled == False).fetch()
-        if games:
-            count = len(games)
-            total_user_steps = sum([game.user_steps
-                                        for game in games])
-            average = float(total_user_steps)/count
-            memcache.set(MEMCACHE_MOVES_REMAINING,
-                         'The average moves is {:.2f}'.format(average))
-
 
 api = endpoints.api_server([TicTacToeApi])
@@ -0,0 +1,100 @@
+"""archive.py - Compaction of the live game kinds. Finished and cancelled games
+are packed together with their History into GameArchive records, abandoned
+games are archived as cancelled. Called by the compact_games cron job."""
+
+import datetime
+
+from google.appengine.ext import ndb
+
+from models import TicTac, History, GameArchive
+
+# Days since the last step before a finished or cancelled game is archived
+ARCHIVE_AFTER_DAYS = 30
+# Days since the last step before an active game is archived as cancelled
+ABANDON_AFTER_DAYS = 7
+BATCH_SIZE = 100
+
+
+def archive_abandoned_games(days=ABANDON_AFTER_DAYS, batch_size=BATCH_SIZE):
+    """Archives the active games without a move in the last `days` days as
+    cancelled games. They are archived in one pass, so the last_step of the
+    archive is still the time of the last move. Returns the number of
+    archived games."""
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
+    query = TicTac.query(TicTac.game_over == False,
+                         TicTac.cancelled == False,
+                         TicTac.last_step < cutoff)
+    return _archive_query(
+            query, batch_size, cancel=True,
+            is_due=lambda game: (not game.game_over and not game.cancelled and
+                                 game.last_step < cutoff))
+
+
+def archive_finished_games(days=ARCHIVE_AFTER_DAYS, batch_size=BATCH_SIZE):
+    """Archives the finished and cancelled games without a move in the last
+    `days` days and deletes them and their History from the live kinds.
+    Returns the number of archived games."""
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
+    queries = (TicTac.query(TicTac.game_over == True,
+                            TicTac.last_step < cutoff),
+               TicTac.query(TicTac.cancelled == True,
+                            TicTac.last_step < cutoff))
+    is_due = lambda game: ((game.game_over or game.cancelled) and
+                           game.last_step < cutoff)
+    return sum(_archive_query(query, batch_size, is_due)
+               for query in queries)
+
+
+def _archive_query(query, batch_size, is_due, cancel=False):
+    """Archives the games of a query batch by batch. Returns the number of
+    archived games."""
+    count = 0
+    cursor, more = None, True
+    while more:
+        keys, cursor, more = query.fetch_page(batch_size, start_cursor=cursor,
+                                              keys_only=True)
+        count += _archive_games(keys, is_due, cancel)
+    return count
+
+
+def _archive_games(keys, is_due, cancel):
+    """Archives and deletes a batch of games. The index may lag behind, so
+    games already archived or no longer due are skipped."""
+    games = [game for game in ndb.get_multi(keys) if game and is_due(game)]
+    futures = [History.query(History.game == game.key).order(History.steps).
+               fetch_async() for game in games]
+
+    count = 0
+    for game, future in zip(games, futures):
+        histories = future.get_result()
+        if _archive_game(game, histories, is_due, cancel):
+            # Only the History packed into the archive is deleted. A row of
+            # a move made meanwhile stays for the next run.
+            ndb.delete_multi([history.key for history in histories])
+            count += 1
+    return count
+
+
+@ndb.transactional(xg=True)
+def _archive_game(game, histories, is_due, cancel):
+    """Stores the archive and deletes the game in one transaction. Returns
+    False if the game changed since it was read. If a move stored the game
+    again after it was archived, its History is merged into the archive."""
+    archive_key = ndb.Key(GameArchive, game.key.id())
+    current, archived = ndb.get_multi([game.key, archive_key])
+    if (not current or current.last_step != game.last_step or
+            not is_due(current)):
+        return False
+
+    archive = GameArchive.from_game(current, histories)
+    if cancel:
+        archive.cancelled = True
+    if archived:
+        steps = set(row[4] for row in archived.history)
+        archive.history = sorted(
+                archived.history +
+                [row for row in archive.history if row[4] not in steps],
+                key=lambda row: row[4])
+    archive.put()
+    current.key.delete()
+    return True
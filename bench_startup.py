@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+"""bench_startup.py - Measures the cold start of an instance: the import time
+of the modules and the latency of the first request with and without the
+warmup request. Every measurement runs in a fresh interpreter.
+
+Usage: python bench_startup.py [path to the App Engine SDK] [repeats]
+The SDK path can also be given in the APPENGINE_SDK environment variable."""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+MODULES = ('main', 'stats', 'board_codec', 'solver', 'models', 'api')
+REQUESTS = ('cold', 'warm')
+
+
+def _setup(sdk):
+    """Puts the SDK and its libraries on the path"""
+    sys.path.insert(0, sdk)
+    import dev_appserver
+    dev_appserver.fix_sys_path()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def _spi_request(method, body):
+    """Dispatches a request to the Endpoints app the way the API frontend
+    does and returns the response"""
+    import webob
+    import api
+    request = webob.Request.blank('/_ah/spi/TicTacToeApi.%s' % method,
+                                  method='POST', body=json.dumps(body),
+                                  content_type='application/json')
+    request.headers['X-AppEngine-Peer'] = 'apiserving'
+    response = request.get_response(api.api)
+    if response.status_int != 200:
+        raise RuntimeError('%s failed: %s %s' % (method, response.status,
+                                                 response.body))
+    return response
+
+
+def _first_request(warm):
+    """Returns the seconds of the warmup request (or 0) and of the first API
+    requests on a new game, make_move and then get_move_analysis, each
+    dispatched through api.api and timed on its own. The game is stored
+    before the clocks start without loading the API. make_move includes the
+    engine's minimax in computer_move, which the warmup does not touch."""
+    from google.appengine.ext import testbed
+    bed = testbed.Testbed()
+    bed.activate()
+    bed.init_datastore_v3_stub()
+    bed.init_memcache_stub()
+    bed.init_taskqueue_stub()
+
+    from models import User, TicTac
+    user = User(name='bench')
+    user.put()
+    urlsafe_game_key = TicTac.new_game(user.key, True).key.urlsafe()
+
+    warmup = 0
+    if warm:
+        import main
+        start = time.time()
+        main.app.get_response('/_ah/warmup')
+        warmup = time.time() - start
+
+    # Without the warmup the first request imports the API on its own
+    start = time.time()
+    _spi_request('make_move', {'urlsafe_game_key': urlsafe_game_key,
+                               'position': 0})
+    make_move = time.time() - start
+
+    start = time.time()
+    _spi_request('get_move_analysis', {'urlsafe_game_key': urlsafe_game_key})
+    analysis = time.time() - start
+    bed.deactivate()
+    return warmup, make_move, analysis
+
+
+def child(sdk, measurement):
+    """Runs one measurement and prints the seconds"""
+    _setup(sdk)
+    if measurement in REQUESTS:
+        # The engine prints its moves, keep the output clean
+        stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+        seconds = _first_request(measurement == 'warm')
+        sys.stdout = stdout
+        print('%f %f %f' % seconds)
+    else:
+        start = time.time()
+        __import__(measurement)
+        print('%f' % (time.time() - start))
+
+
+def _run(sdk, measurement):
+    output = subprocess.check_output(
+            [sys.executable, __file__, '--child', sdk, measurement])
+    return [float(value) for value in output.split()]
+
+
+def _median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main(sdk, repeats):
+    print('Import time (ms, median of %d)' % repeats)
+    for module in MODULES:
+        times = [_run(sdk, module)[0] for repeat in range(repeats)]
+        print('  %-12s %8.1f' % (module, _median(times) * 1000))
+
+    print('First requests (ms, median of %d)' % repeats)
+    for measurement in REQUESTS:
+        results = [_run(sdk, measurement) for repeat in range(repeats)]
+        print('  %-12s warmup %8.1f  make_move %8.1f  '
+              'get_move_analysis %8.1f' % (
+                (measurement,) +
+                tuple(_median([result[index] for result in results]) * 1000
+                      for index in range(3))))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(sys.argv[2], sys.argv[3])
+    else:
+        sdk = sys.argv[1] if len(sys.argv) > 1 else \
+            os.environ.get('APPENGINE_SDK')
+        if not sdk:
+            sys.exit(__doc__)
+        main(sdk, int(sys.argv[2]) if len(sys.argv) > 2 else 5)
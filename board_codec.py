@@ -0,0 +1,120 @@
+"""board_codec.py - Compact encoding of Tic Tac Toe boards. A board is coded
+as a base-3 integer: square i contributes 3**i times 0 (empty), 1 (X) or
+2 (O). Coding a board and making a move are arithmetic. The board string,
+legal moves, winner and display string of a code are computed on its first
+lookup and kept in a table, which load() fills with every reachable
+position in the warmup request."""
+
+SQUARES = ' XO'
+DIGITS = {' ': 0, 'X': 1, 'O': 2}
+EMPTY_CODE = 0
+
+WINNING_STREAKS = (
+    (0, 1, 2), (3, 4, 5), (6, 7, 8),
+    (0, 3, 6), (1, 4, 7), (2, 5, 8),
+    (0, 4, 8), (2, 4, 6))
+
+# code -> (board, legal moves, legal moves string, winner, display)
+_POSITIONS = {}
+
+
+def _winner_of(board):
+    """Gets the winner of a board string the same way as TicTacToe"""
+    for player in ('X', 'O'):
+        for a, b, c in WINNING_STREAKS:
+            if board[a] == board[b] == board[c] == player:
+                return player
+    return None
+
+
+def _position(code):
+    """Returns the table entry of a code, computing it on first use"""
+    try:
+        return _POSITIONS[code]
+    except KeyError:
+        pass
+    squares = []
+    rest = code
+    for index in range(9):
+        rest, digit = divmod(rest, 3)
+        squares.append(SQUARES[digit])
+    board = ''.join(squares)
+    moves = tuple(index for index, square in enumerate(squares)
+                  if square == ' ')
+    position = (board, moves, ' '.join(str(index) for index in moves),
+                _winner_of(board),
+                board[0:3] + '|' + board[3:6] + '|' + board[6:])
+    _POSITIONS[code] = position
+    return position
+
+
+def load():
+    """Fills the table with every position reachable from the empty board,
+    whoever starts"""
+    stack = [(EMPTY_CODE, 'X'), (EMPTY_CODE, 'O')]
+    seen = set()
+    while stack:
+        code, player = stack.pop()
+        if (code, player) in seen:
+            continue
+        seen.add((code, player))
+        board, moves, moves_str, winner, display = _position(code)
+        if winner is None:
+            opponent = 'O' if player == 'X' else 'X'
+            stack.extend((move(code, index, player), opponent)
+                         for index in moves)
+
+
+def encode(board):
+    """Returns the code of a 9 length board string. Raises ValueError if the
+    string is not a board"""
+    if len(board) != 9:
+        raise ValueError('Invalid board: %r' % board)
+    code = 0
+    try:
+        for square in reversed(board):
+            code = code * 3 + DIGITS[square]
+    except KeyError:
+        raise ValueError('Invalid board: %r' % board)
+    return code
+
+
+def decode(code):
+    """Returns the 9 length board string of a code"""
+    return _position(code)[0]
+
+
+def move(code, position, player):
+    """Returns the code after player moves to the empty position"""
+    return code + DIGITS[player] * 3 ** position
+
+
+def legal_moves(code):
+    """Get the empty spaces"""
+    return _position(code)[1]
+
+
+def legal_moves_str(code):
+    """Get the empty spaces separated by space"""
+    return _position(code)[2]
+
+
+def is_legal_move(code, position):
+    """Is the position empty?"""
+    return position in _position(code)[1]
+
+
+def winner(code):
+    """Get the winner ('X' or 'O') of the board or None"""
+    return _position(code)[3]
+
+
+def leaf(code):
+    """Is the board full or has someone won the game"""
+    position = _position(code)
+    return not position[1] or position[3] is not None
+
+
+def display(code):
+    """Returns the board split by |, for example 'X  |XO |O X'"""
+    return _position(code)[4]
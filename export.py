@@ -0,0 +1,103 @@
+"""export.py - Newline-delimited JSON export of the game kinds for the
+analytics pipeline. Every call writes one chunk of rows and returns the
+cursor to continue from, so an export runs in constant memory and a
+timed-out export can be resumed."""
+
+import datetime
+import json
+import time
+
+from google.appengine.ext import ndb
+
+from models import TicTac, History, Score, GameArchive
+
+# Most rows of the driving query in one chunk
+EXPORT_LIMIT = 1000
+# Seconds to spend on one chunk, well below the request deadline
+EXPORT_DEADLINE = 45
+BATCH_SIZE = 100
+
+SINCE_FORMATS = ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d')
+
+
+def parse_since(since):
+    """Parses an ISO formatted watermark. Raises ValueError if it is not a
+    date or a date and time"""
+    for since_format in SINCE_FORMATS:
+        try:
+            return datetime.datetime.strptime(since, since_format)
+        except ValueError:
+            pass
+    raise ValueError('Invalid since: %r' % since)
+
+
+def _default(value):
+    """Converts the values json does not know"""
+    if isinstance(value, ndb.Key):
+        return value.urlsafe()
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError('%r is not JSON serializable' % value)
+
+
+def to_json(entity):
+    """Returns an entity as a line of JSON"""
+    row = entity.to_dict()
+    row['key'] = entity.key
+    return json.dumps(row, default=_default, sort_keys=True)
+
+
+def _query(kind, since):
+    """Returns the driving query of kind ordered by the watermark property.
+    Histories are exported by the games, scores by their date and archives
+    by the time they were archived."""
+    if kind == 'scores':
+        query = Score.query().order(Score.date)
+        if since:
+            query = query.filter(Score.date >= since.date())
+        return query
+
+    if kind == 'archives':
+        query = GameArchive.query().order(GameArchive.archived)
+        if since:
+            query = query.filter(GameArchive.archived >= since)
+        return query
+
+    query = TicTac.query().order(TicTac.last_step)
+    if since:
+        query = query.filter(TicTac.last_step >= since)
+    return query
+
+
+def _lines(kind, entities):
+    """Yields the JSON lines of a batch of the driving query"""
+    if kind != 'histories':
+        for entity in entities:
+            yield to_json(entity)
+        return
+
+    futures = [History.query(History.game == game.key).order(History.steps).
+               fetch_async() for game in entities]
+    for future in futures:
+        for history in future.get_result():
+            yield to_json(history)
+
+
+def export(write, kind, since=None, cursor=None, limit=EXPORT_LIMIT,
+           deadline=EXPORT_DEADLINE):
+    """Writes the rows of kind ('games', 'histories', 'scores' or 'archives')
+    changed since the watermark as JSON lines by write(), starting at cursor.
+    Stops after limit rows of the driving query or deadline seconds.
+    Returns the cursor to continue from (None at the end) and the number of
+    rows of the driving query exported."""
+    query = _query(kind, since)
+    end = time.time() + deadline
+    count = 0
+    more = True
+    while more and count < limit and time.time() < end:
+        entities, cursor, more = query.fetch_page(
+                min(BATCH_SIZE, limit - count), start_cursor=cursor)
+        for line in _lines(kind, entities):
+            write(line + '\n')
+        count += len(entities)
+    return (cursor if more else None), count
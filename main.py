@@ -1,15 +1,12 @@
 #!/usr/bin/env python
 
 """main.py - This file contains handlers that are called by taskqueue and/or
-cronjobs."""
+cronjobs. The handlers import what they need when they are called, so
+starting an instance for a cron job or task does not load the whole app."""
 import logging
 
 import webapp2
 import datetime
-from google.appengine.api import mail, app_identity
-from api import TicTacToeApi
-
-from models import User, TicTac
 
 
 class SendReminderEmail(webapp2.RequestHandler):
@@ -17,36 +14,127 @@ class SendReminderEmail(webapp2.RequestHandler):
     def get(self):
         """Send a reminder email to each User with an email about active games.
         Called every hour using a cron job"""
+        from google.appengine.api import mail, app_identity
+        from google.appengine.ext import ndb
+        from models import TicTac
+
         app_id = app_identity.get_application_id()
-        game_users = TicTac.query(projection=["user"], distinct =True,
-                        TicTac.last_step <
-                        (datetime.datetime.now() -
-                         datetime.timedelta(hours=12)),
-                        TicTac.game_over != True,
-                        TicTac.cancelled != True).order(user)
-
-        for user in game_users:
-            user_to_mail = User.query(User.key == user.key)
+        games = TicTac.query(TicTac.game_over == False,
+                             TicTac.cancelled == False,
+                             TicTac.last_step <
+                             (datetime.datetime.now() -
+                              datetime.timedelta(hours=12)))
+        user_keys = set(game.user for game in
+                        games.iter(projection=[TicTac.user]))
+
+        for user in ndb.get_multi(user_keys):
+            if not user or not user.email:
+                continue
             subject = 'This is a reminder!'
             body = '''Hello {},
                       You have not made a move in your active game(s)
-                      for more than 12 hours!'''.format(user_to_mail.name)
+                      for more than 12 hours!'''.format(user.name)
             # This will send test emails, the arguments to send_mail are:
             # from, to, subject, body
             mail.send_mail('noreply@{}.appspotmail.com'.format(app_id),
-                           user_to_mail.email,
+                           user.email,
                            subject,
                            body)
 
 
+class CompactGames(webapp2.RequestHandler):
+
+    def get(self):
+        """Archive abandoned games as cancelled, then archive the finished and
+        cancelled ones. The ages (in days, at least 1) can be set by the
+        archive_days and abandon_days parameters. Called every day using a
+        cron job"""
+        from archive import archive_abandoned_games, archive_finished_games
+        from archive import ARCHIVE_AFTER_DAYS, ABANDON_AFTER_DAYS
+
+        try:
+            archive_days = int(self.request.get('archive_days',
+                                                ARCHIVE_AFTER_DAYS))
+            abandon_days = int(self.request.get('abandon_days',
+                                                ABANDON_AFTER_DAYS))
+        except ValueError:
+            self.abort(400)
+        if archive_days < 1 or abandon_days < 1:
+            self.abort(400)
+
+        abandoned = archive_abandoned_games(abandon_days)
+        archived = archive_finished_games(archive_days)
+        logging.info('Archived %d abandoned and %d finished games',
+                     abandoned, archived)
+
+
+class ExportData(webapp2.RequestHandler):
+
+    def get(self, kind):
+        """Write a chunk of games, histories, scores or archives as
+        newline-delimited JSON. Optional parameters: since (ISO date or date
+        and time of the last step, of archiving for archives), cursor and
+        limit (at most EXPORT_LIMIT).
+        A cursor is only valid with the kind and since it was issued for.
+        While there are more rows, the cursor to continue from is sent in
+        X-Export-Cursor."""
+        from google.appengine.api import datastore_errors
+        from google.appengine.datastore.datastore_query import Cursor
+        from export import export, parse_since, EXPORT_LIMIT
+
+        try:
+            since = self.request.get('since')
+            since = parse_since(since) if since else None
+            cursor = self.request.get('cursor')
+            cursor = Cursor(urlsafe=cursor) if cursor else None
+            limit = int(self.request.get('limit', EXPORT_LIMIT))
+        except (ValueError, datastore_errors.BadValueError), e:
+            logging.warning('Invalid export request: %s', e)
+            self.abort(400)
+        if limit < 1:
+            self.abort(400)
+        # The response is buffered, so a chunk is never above EXPORT_LIMIT
+        limit = min(limit, EXPORT_LIMIT)
+
+        self.response.headers['Content-Type'] = 'application/x-ndjson'
+        try:
+            cursor, count = export(self.response.out.write, kind, since=since,
+                                   cursor=cursor, limit=limit)
+        except (datastore_errors.BadRequestError,
+                datastore_errors.BadArgumentError), e:
+            # A cursor of another kind or since does not match the query
+            logging.warning('Invalid export cursor: %s', e)
+            self.response.clear()
+            self.abort(400)
+        self.response.headers['X-Export-Count'] = str(count)
+        if cursor:
+            self.response.headers['X-Export-Cursor'] = cursor.urlsafe()
+
+
 class UpdateAverageSteps(webapp2.RequestHandler):
     def post(self):
         """Update game listing announcement in memcache."""
-        TicTacToeApi._cache_average_steps()
+        from stats import cache_average_steps
+
+        cache_average_steps()
         self.response.set_status(204)
 
 
+class Warmup(webapp2.RequestHandler):
+    def get(self):
+        """Load the API and solve the engine's positions before the first
+        request. Called by App Engine when a new instance starts"""
+        import api
+        import solver
+
+        solver.preload()
+        self.response.set_status(200)
+
+
 app = webapp2.WSGIApplication([
     ('/crons/send_reminder', SendReminderEmail),
+    ('/crons/compact_games', CompactGames),
+    ('/export/(games|histories|scores|archives)', ExportData),
     ('/tasks/cache_average_steps', UpdateAverageSteps),
+    ('/_ah/warmup', Warmup),
 ], debug=True)
@@ -3,6 +3,7 @@ entities used by the Game. Because these classes are also regular Python
 classes they can include methods (such as 'to_form' and 'new_game')."""
 
 import random
+import board_codec
 from tictac import TicTacToe
 from tictac import computer_move
 from datetime import date
@@ -36,6 +37,9 @@ class TicTac(ndb.Model):
     cancelled = ndb.BooleanProperty(required=True, default=False)
     winner = ndb.IntegerProperty()
     last_step = ndb.DateTimeProperty(auto_now=True)
+    # The board as a base-3 integer, to query the games by position
+    board_code = ndb.ComputedProperty(
+        lambda self: board_codec.encode(self.board))
 
     @classmethod
     def new_game(cls, user, user_start, board='         '):
@@ -55,25 +59,27 @@ class TicTac(ndb.Model):
         tic.put()
         return tic
 
-    def legal_moves_str(self, board):
+    @classmethod
+    def query_position(cls, board):
+        """Returns a query of the games currently at the board"""
+        return cls.query(cls.board_code == board_codec.encode(board))
+
+    def legal_moves_str(self, board_code):
         """ Get the empty spaces """
-        return ' '.join(str(index) for index,
-                square in enumerate(list(board)) if square == ' ')
+        return board_codec.legal_moves_str(board_code)
 
-    def is_legal_moves(self, board, move):
+    def is_legal_moves(self, board_code, move):
         """ Is the move is legal? """
-        return move in [index for index,
-                square in enumerate(list(board)) if square == ' ']
+        return board_codec.is_legal_move(board_code, move)
 
     def make_a_move(self, position):
-        board = TicTacToe(list(self.board))
-
         if (self.game_over or self.cancelled):
             return self.to_form('Game is already over!')
         else:
-            if self.is_legal_moves(self.board, position):
-                board.move(position,'X')
-                self.board = board.output()
+            code = self.board_code
+            if self.is_legal_moves(code, position):
+                code = board_codec.move(code, position, 'X')
+                self.board = board_codec.decode(code)
 
                 history = History(game=self.key,
                                     is_human=True,
@@ -84,16 +90,18 @@ class TicTac(ndb.Model):
                 history.put()
 
                 self.user_steps += 1
-                if board.X_won():
+                if board_codec.winner(code) == 'X':
                     self.end_game(1)
                     msg = 'Congratulation! You win!'
                 elif self.user_steps == 9:
                     msg = 'It is tied! Game Over'
                     self.end_game(0)
                 else:
-                    comp_position = computer_move(board,'O')
-                    board.move(comp_position, 'O')
-                    self.board = board.output()
+                    # Only the engine works on a list board
+                    comp_position = computer_move(TicTacToe(list(self.board)),
+                                                  'O')
+                    code = board_codec.move(code, comp_position, 'O')
+                    self.board = board_codec.decode(code)
 
                     history = History(game=self.key,
                                     is_human=False,
@@ -104,17 +112,17 @@ class TicTac(ndb.Model):
                     history.put()
 
                     self.user_steps +=1
-                    if board.O_won():
+                    if board_codec.winner(code) == 'O':
                         self.end_game(-1)
                         msg = 'You lose it!'
-                    elif board.leaf():
+                    elif board_codec.leaf(code):
                         self.end_game(0)
                         msg = 'It is tied! Game Over'
                     else:
                         msg = 'Your turn'
             else:
                 msg = 'Invalid move! Choose from the following: %s' %\
-                      self.legal_moves_str(self.board)
+                      self.legal_moves_str(code)
             self.put()
 
         return self.to_form(msg)
@@ -127,8 +135,7 @@ class TicTac(ndb.Model):
         form.user_name = self.user.get().name
         form.game_over = self.game_over
         form.message = message
-        form.board = self.board[0:3] + '|' + self.board[3:6] + '|' +\
-                     self.board[6:]
+        form.board = board_codec.display(self.board_code)
         form.steps = self.user_steps
         form.cancelled = self.cancelled
         form.winner = self.winner
@@ -184,6 +191,8 @@ class History(ndb.Model):
     board = ndb.StringProperty(required=True)
     msg = ndb.StringProperty(required=True)
     steps = ndb.IntegerProperty(required=True)
+    board_code = ndb.ComputedProperty(
+        lambda self: board_codec.encode(self.board))
 
     def to_form(self):
         form = HistoryForm()
@@ -209,6 +218,54 @@ class Score(ndb.Model):
                          date=str(self.date), user_steps=self.user_steps)
 
 
+class GameArchive(ndb.Model):
+    """Compact record of a finished or cancelled game and its history.
+    Keyed with the id of the archived TicTac entity."""
+    user = ndb.KeyProperty(required=True, kind='User')
+    board = ndb.StringProperty(required=True, indexed=False)
+    user_start = ndb.BooleanProperty(required=True, indexed=False)
+    user_steps = ndb.IntegerProperty(required=True, indexed=False)
+    game_over = ndb.BooleanProperty(indexed=False, default=False)
+    cancelled = ndb.BooleanProperty(required=True, indexed=False)
+    winner = ndb.IntegerProperty(indexed=False)
+    last_step = ndb.DateTimeProperty(required=True)
+    # When the record was written, the watermark of the archives export
+    archived = ndb.DateTimeProperty(auto_now_add=True)
+    # History rows packed as [is_human, position, board, msg, steps] lists
+    history = ndb.JsonProperty(compressed=True)
+
+    @classmethod
+    def from_game(cls, game, histories):
+        """Creates (but does not store) the archive record of a game"""
+        return GameArchive(id=game.key.id(),
+                           user=game.user,
+                           board=game.board,
+                           user_start=game.user_start,
+                           user_steps=game.user_steps,
+                           game_over=game.game_over,
+                           cancelled=game.cancelled,
+                           winner=game.winner,
+                           last_step=game.last_step,
+                           history=[[history.is_human, history.position,
+                                     history.board, history.msg,
+                                     history.steps]
+                                    for history in histories])
+
+    def to_form(self, message=''):
+        """Returns a TicTacForm representation of the archived game, with
+        the urlsafe key of the game"""
+        form = TicTacForm()
+        form.urlsafe_key = ndb.Key(TicTac, self.key.id()).urlsafe()
+        form.user_name = self.user.get().name
+        form.game_over = self.game_over
+        form.message = message
+        form.board = board_codec.display(board_codec.encode(self.board))
+        form.steps = self.user_steps
+        form.cancelled = self.cancelled
+        form.winner = self.winner
+        return form
+
+
 class TicTacForm(messages.Message):
     """TicTacForm for outbound game state information"""
     urlsafe_key = messages.StringField(1, required=True)
@@ -273,6 +330,21 @@ class HistoryForms(messages.Message):
     items = messages.MessageField(HistoryForm, 1, repeated=True)
 
 
+class MoveAnalysisForm(messages.Message):
+    """Game-theoretic value of a legal move"""
+    position = messages.IntegerField(1, required=True)
+    value = messages.IntegerField(2, required=True)
+    distance = messages.IntegerField(3, required=True)
+
+
+class MoveAnalysisForms(messages.Message):
+    """Analysis of every legal move of a position"""
+    board = messages.StringField(1, required=True)
+    player = messages.StringField(2, required=True)
+    recommended_move = messages.IntegerField(3)
+    items = messages.MessageField(MoveAnalysisForm, 4, repeated=True)
+
+
 class StringMessage(messages.Message):
     """StringMessage-- outbound (single) string message"""
     message = messages.StringField(1, required=True)
@@ -0,0 +1,64 @@
+"""solver.py - Cached game-theoretic solver of Tic Tac Toe positions. Every
+solved position is kept by its board code and the player to move, so after
+the first request analysing a position costs only table lookups."""
+
+import board_codec
+from tictac import get_opponent
+
+# (board code, player to move) -> (value, distance)
+_SOLVED = {}
+
+
+def _rank(result):
+    """Sort key of a (value, distance) pair: win fast, lose slowly"""
+    value, distance = result[-2:]
+    if value > 0:
+        return (value, -distance)
+    return (value, distance)
+
+
+def solve(code, player):
+    """Solves the position with player to move. Returns (value, distance):
+    value is 1 if player wins, 0 if it is tied and -1 if player loses with
+    perfect play, distance is the number of steps until the game is over."""
+    key = (code, player)
+    if key not in _SOLVED:
+        winner = board_codec.winner(code)
+        if winner is not None:
+            _SOLVED[key] = (1 if winner == player else -1, 0)
+        elif not board_codec.legal_moves(code):
+            _SOLVED[key] = (0, 0)
+        else:
+            _SOLVED[key] = max(((value, distance) for position, value, distance
+                                in analyse(code, player)), key=_rank)
+    return _SOLVED[key]
+
+
+def analyse(code, player):
+    """Returns a (position, value, distance) tuple for every legal move of
+    player, valued from player's side. Empty if the game is over."""
+    if board_codec.leaf(code):
+        return []
+    opponent = get_opponent(player)
+    moves = []
+    for position in board_codec.legal_moves(code):
+        value, distance = solve(board_codec.move(code, position, player),
+                                opponent)
+        moves.append((position, -value, distance + 1))
+    return moves
+
+
+def best_move(moves):
+    """Returns the position of the best analysed move or None"""
+    if not moves:
+        return None
+    return max(moves, key=_rank)[0]
+
+
+def preload():
+    """Builds the board tables and solves every position reachable from the
+    empty board, whoever starts. Called by the warmup request of a new
+    instance."""
+    board_codec.load()
+    solve(board_codec.EMPTY_CODE, 'X')
+    solve(board_codec.EMPTY_CODE, 'O')
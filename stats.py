@@ -0,0 +1,21 @@
+"""stats.py - Game statistics shared by the API and the task handlers. Kept
+apart from api.py, so the task handlers do not load the Endpoints stack."""
+
+from google.appengine.api import memcache
+
+from models import TicTac
+
+MEMCACHE_MOVES_REMAINING = 'MOVES_REMAINING'
+
+
+def cache_average_steps():
+    """Populates memcache with the average moves of Games"""
+    games = TicTac.query(TicTac.game_over == False,
+                         TicTac.cancelled == False).fetch()
+    if games:
+        count = len(games)
+        total_user_steps = sum([game.user_steps
+                                    for game in games])
+        average = float(total_user_steps)/count
+        memcache.set(MEMCACHE_MOVES_REMAINING,
+                     'The average moves is {:.2f}'.format(average))